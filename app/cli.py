@@ -1,27 +1,54 @@
+from __future__ import annotations
+import shlex
+import sys
 import typer
 from typing import Annotated
-from app.database import create_db_and_tables, get_session, drop_all
-from app.models import User
-from fastapi import Depends
-from sqlmodel import select
-from sqlalchemy.exc import IntegrityError
+from app.database import create_db_and_tables, get_session, drop_all, engine
+from app.models import User, user_summary
+from sqlmodel import Session, select, update, delete
+from sqlalchemy import lambda_stmt
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import raiseload
 
 cli = typer.Typer()
 
+@cli.callback()
+def main():
+    '''
+    Manages the users stored in the database
+    '''
+    # Rows are written in batches, don't flush on every newline (runs however the CLI is launched)
+    reconfigure = getattr(sys.stdout, "reconfigure", None)
+    if reconfigure:
+        reconfigure(line_buffering=False)
+
+def write_lines(lines, batch_size=1000):
+    # Write output in batches instead of one print per row, returns the number of lines written
+    buf = []
+    count = 0
+    for line in lines:
+        buf.append(f"{line}\n")
+        count += 1
+        if len(buf) >= batch_size:
+            sys.stdout.writelines(buf)
+            buf.clear()
+    sys.stdout.writelines(buf)
+    return count
+
 @cli.command()
 def initialize():
     '''
     Creates an empty database and adds a default user ''bob'
     '''
-    with get_session() as db: # Get a connection to the database
-        drop_all() # delete all tables
-        create_db_and_tables() #recreate all tables
-        # bob = User(username="bob", email="bob@mail.com", password="bobpass") # Create a new user (in memory)
-        bob = User("bob", "bob@mail.com", "bobpass") # Create a new user (in memory)
-        db.add(bob) # Tell the database about this new data
-        db.commit() # Tell the database persist the data
-        db.refresh(bob) # Update the user (we use this to get the ID from the db)
-        print("Database Initialized")
+    # bob = User(username="bob", email="bob@mail.com", password="bobpass") # Create a new user (in memory)
+    bob = User("bob", "bob@mail.com", "bobpass") # Create a new user (in memory)
+    with engine.begin() as conn: # One connection and transaction for the whole reset, committed when the block exits
+        drop_all(conn) # delete all tables
+        create_db_and_tables(conn) #recreate all tables
+        with Session(bind=conn) as db: # Seed through the same connection
+            db.add(bob) # Tell the database about this new data
+            db.commit() # Flush the seed user, the outer transaction is committed by engine.begin()
+    print("Database Initialized")
 
 @cli.command()
 def get_user(username: Annotated[str, typer.Argument(help="The name of the user to be searched for")]):
@@ -29,7 +56,11 @@ def get_user(username: Annotated[str, typer.Argument(help="The name of the user
     Prints user information given the username
     '''
     with get_session() as db: 
-        user = db.exec(select(User).where(User.username == username)).first()
+        # lambda_stmt caches the built statement, username is picked up as a bound parameter
+        # raiseload errors on any lazy load instead of issuing extra queries
+        user = db.exec(lambda_stmt(
+            lambda: select(User).where(User.username == username).options(raiseload('*'))
+        )).scalars().first()
         if not user:
             print(f'{username} not found!')
             return
@@ -40,13 +71,14 @@ def get_all_users():
     '''
     Prints all users that exist within the database
     '''
-    with get_session() as db:
-        all_users = db.exec(select(User)).all()
-        if not all_users:
+    # Read only, so skip the ORM session and fetch plain rows in batches straight from a connection
+    with engine.connect() as conn:
+        result = conn.execution_options(yield_per=1000).execute(select(User.id, User.username, User.email))
+        count = 0
+        for partition in result.partitions():
+            count += write_lines(user_summary(user) for user in partition)
+        if not count:
             print("No users found")
-        else:
-            for user in all_users:
-                print(user)
 
 
 @cli.command()
@@ -58,14 +90,18 @@ def change_email(
     Changes the email of the provided username record to the given new email address
     '''
     with get_session() as db:
-        user = db.exec(select(User).where(User.username == username)).first()
-        if not user:
+        # Single cached UPDATE statement, no need to load the user first or sync the (empty) session afterwards
+        result = db.exec(lambda_stmt(
+            lambda: update(User)
+            .where(User.username == username)
+            .values(email=new_email)
+            .execution_options(synchronize_session=False)
+        ))
+        if not result.rowcount:
             print(f'{username} not found! Unable to update email.')
             return
-        user.email = new_email
-        db.add(user)
         db.commit()
-        print(f"Updated {user.username}'s email to {user.email}")
+        print(f"Updated {username}'s email to {new_email}")
 
 @cli.command()
 def create_user(
@@ -77,6 +113,11 @@ def create_user(
     Create a new user given username, email and password and adds it to the database
     '''
     with get_session() as db:
+        # Cheap indexed lookup first, so we don't hash the password or roll back for a duplicate
+        taken = db.exec(select(User.id).where((User.username == username) | (User.email == email)).limit(1)).first()
+        if taken is not None:
+            print("Username or email already taken!")
+            return
         # newuser = User(username=username, email=email, password=password)
         newuser = User(username, email, password)
         try:
@@ -94,43 +135,85 @@ def delete_user(username: Annotated[str, typer.Argument(help="Username of the re
     Deletes a single user from the database given a username
     '''
     with get_session() as db:
-        user = db.exec(select(User).where(User.username == username)).first()
-        if not user:
+        # Single cached DELETE statement, no need to load the user first or sync the (empty) session afterwards
+        result = db.exec(lambda_stmt(
+            lambda: delete(User)
+            .where(User.username == username)
+            .execution_options(synchronize_session=False)
+        ))
+        if not result.rowcount:
             print(f'{username} not found! Unable to delete user.')
             return
-        db.delete(user)
         db.commit()
         print(f'{username} deleted')
 
 @cli.command()
 def find_by_email(email: Annotated[str, typer.Argument(help="Email address to search by")]):
     '''
-    Searches database for partial matches to the provided email and prints all possible matching records
+    Searches database for partial (case-insensitive) matches to the provided email and prints all possible matching records
     '''
     with get_session() as db:
-        all_users = db.exec(select(User)).all()
-        if not all_users:
+        # Let the database do the matching (lower(email) LIKE lower('%email%'), with % and _ in the input escaped) and only select the columns we print
+        users = db.exec(
+            select(User.id, User.username, User.email)
+            .where(User.email.icontains(email, autoescape=True))
+            .execution_options(yield_per=1000)
+        )
+        if not write_lines(user_summary(user) for user in users):
             print("No users found")
-        else:
-            for user in all_users:
-                if email in user.email:
-                    print(user)
 
 @cli.command()
 def list_num_users(
-    limit: Annotated[int, typer.Argument(help="Specifies the number of users to print")] = 10, 
-    offset: Annotated[int, typer.Argument(help="Specifies where the listing should start from ")] = 0
+    limit: Annotated[int, typer.Argument(min=1, help="Specifies the number of users to print")] = 10, 
+    after_id: Annotated[int, typer.Option(help="Cursor: only list users whose id is greater than this value")] = 0
 ):
     '''
-    Prints the number specified in limit amount of records starting at the offset value in the database
+    Prints the number specified in limit amount of records after the given cursor id and prints the next cursor
     '''
     with get_session() as db:
-        all_users = db.exec(select(User)).all()
-        if not all_users:
+        # Keyset pagination: seek past the cursor on the primary key instead of scanning and discarding OFFSET rows
+        # The page is capped by LIMIT, so loading it all at once is fine
+        users = db.exec(
+            select(User)
+            .options(raiseload('*')) # Error on any lazy load instead of issuing extra queries
+            .where(User.id > after_id)
+            .order_by(User.id)
+            .limit(limit)
+        ).all()
+        if not users:
             print("No users found")
         else:
-            for i in range(offset, min(offset + limit, len(all_users))):
-                print(all_users[i])
+            write_lines(users)
+            print(f"next cursor: {users[-1].id}")
+
+@cli.command()
+def repl():
+    '''
+    Runs commands from stdin in one process so the imports, engine and connection pool stay warm between commands
+    '''
+    while True:
+        try:
+            line = input("> ")
+        except EOFError:
+            break
+        try:
+            args = shlex.split(line)
+        except ValueError as e: # e.g. an unbalanced quote
+            print(f"Error: {e}")
+            continue
+        if not args:
+            continue
+        if args[0] in ("exit", "quit"):
+            break
+        if args[0] == "repl":
+            print("Already in the repl")
+            continue
+        try:
+            cli(args, prog_name="cli")
+        except SystemExit: # typer exits after every command (and on usage errors), keep the loop going
+            pass
+        except (SQLAlchemyError, ValueError) as e: # a failing command shouldn't end the whole session
+            print(f"Error: {e}")
 
 if __name__ == "__main__":
     cli()
@@ -1,4 +1,5 @@
 from contextlib import contextmanager
+from sqlalchemy import event
 from sqlmodel import Session, SQLModel, create_engine
 from typing import Annotated
 from fastapi import Depends
@@ -9,13 +10,38 @@ sqlite_file_name = "database.db"
 sqlite_url = f"sqlite:///{sqlite_file_name}"
 
 connect_args = {"check_same_thread": False}
-engine = create_engine(sqlite_url, connect_args=connect_args)
-
-def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
-
-def drop_all():
-    SQLModel.metadata.drop_all(bind=engine)
+def make_engine(url):
+    # Pre-ping only matters for network databases, a local SQLite file has no server connection to go stale
+    engine = create_engine(
+        url,
+        connect_args=connect_args,
+        pool_size=10,
+        max_overflow=20,
+        pool_timeout=30,
+        pool_pre_ping=not url.startswith("sqlite"),
+    )
+
+    if url.startswith("sqlite"):
+        # pysqlite autocommits DDL by default; let SQLAlchemy emit BEGIN itself so schema changes are transactional too
+        # (https://docs.sqlalchemy.org/en/20/dialects/sqlite.html#serializable-isolation-savepoints-transactional-ddl)
+        @event.listens_for(engine, "connect")
+        def disable_pysqlite_transactions(dbapi_connection, connection_record):
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(engine, "begin")
+        def emit_begin(conn):
+            conn.exec_driver_sql("BEGIN")
+
+    return engine
+
+# Module level engine so every session reuses connections from the same pool
+engine = make_engine(sqlite_url)
+
+def create_db_and_tables(bind=None):
+    SQLModel.metadata.create_all(bind or engine)
+
+def drop_all(bind=None):
+    SQLModel.metadata.drop_all(bind=bind or engine)
 
 @contextmanager
 def get_session():
@@ -1,8 +1,33 @@
 from sqlmodel import Field, SQLModel
 from typing import Optional
+import os
 from pwdlib import PasswordHash
+from pwdlib.hashers.argon2 import Argon2Hasher
 
-password_hash = PasswordHash.recommended()
+def dev_argon2_time_cost():
+    # DEV ONLY: a lower Argon2 time cost makes seeding/tests faster, but weakens every hash (API included)
+    value = os.environ.get("DEV_ARGON2_TIME_COST")
+    if value is None:
+        return None
+    message = f"DEV_ARGON2_TIME_COST must be a positive integer, got {value!r}"
+    try:
+        time_cost = int(value)
+    except ValueError:
+        raise ValueError(message) from None
+    if time_cost < 1:
+        raise ValueError(message)
+    return time_cost
+
+# Argon2 via the argon2-cffi C extension
+_time_cost = dev_argon2_time_cost()
+if _time_cost is not None:
+    password_hash = PasswordHash((Argon2Hasher(time_cost=_time_cost),))
+else:
+    password_hash = PasswordHash.recommended()
+
+def user_summary(user):
+    # Shared by User.__str__ and queries that only select id, username and email
+    return f"(User id={user.id}, username={user.username} ,email={user.email})"
 
 class User(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -19,4 +44,4 @@ class User(SQLModel, table=True):
         self.password = password_hash.hash(password)
 
     def __str__(self) -> str:
-        return f"(User id={self.id}, username={self.username} ,email={self.email})"
+        return user_summary(self)
@@ -0,0 +1,30 @@
+import os
+
+# Keep password hashing cheap in tests, must be set before app.models is imported
+os.environ.setdefault("DEV_ARGON2_TIME_COST", "1")
+
+import pytest
+from typer.testing import CliRunner
+
+from app import cli as cli_module
+from app import database
+
+
+@pytest.fixture
+def run(tmp_path, monkeypatch):
+    '''
+    Runs CLI commands against a fresh database in a temporary directory
+    '''
+    engine = database.make_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setattr(database, "engine", engine)
+    monkeypatch.setattr(cli_module, "engine", engine)
+    runner = CliRunner()
+
+    def invoke(*args):
+        result = runner.invoke(cli_module.cli, list(args))
+        assert result.exception is None, result.output
+        return result.output
+
+    invoke("initialize")
+    yield invoke
+    engine.dispose()
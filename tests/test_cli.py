@@ -0,0 +1,53 @@
+def test_list_num_users_pages_with_cursor(run):
+    run("create-user", "alice", "alice@mail.com", "alicepass")
+    run("create-user", "carol", "carol@mail.com", "carolpass")
+
+    first = run("list-num-users", "2")
+    assert first.splitlines() == [
+        "(User id=1, username=bob ,email=bob@mail.com)",
+        "(User id=2, username=alice ,email=alice@mail.com)",
+        "next cursor: 2",
+    ]
+
+    second = run("list-num-users", "2", "--after-id", "2")
+    assert second.splitlines() == [
+        "(User id=3, username=carol ,email=carol@mail.com)",
+        "next cursor: 3",
+    ]
+
+
+def test_list_num_users_empty_page(run):
+    assert run("list-num-users", "2", "--after-id", "1") == "No users found\n"
+
+
+def test_find_by_email_treats_wildcards_literally(run):
+    run("create-user", "under", "a_b@mail.com", "pass")
+    run("create-user", "percent", "100%@mail.com", "pass")
+
+    assert run("find-by-email", "_") == "(User id=2, username=under ,email=a_b@mail.com)\n"
+    assert run("find-by-email", "%") == "(User id=3, username=percent ,email=100%@mail.com)\n"
+    assert run("find-by-email", "x_y") == "No users found\n"
+
+
+def test_change_email_unknown_user(run):
+    assert run("change-email", "zed", "zed@mail.com") == "zed not found! Unable to update email.\n"
+
+
+def test_change_email(run):
+    assert run("change-email", "bob", "robert@mail.com") == "Updated bob's email to robert@mail.com\n"
+    assert run("get-user", "bob") == "(User id=1, username=bob ,email=robert@mail.com)\n"
+
+
+def test_delete_user_unknown_user(run):
+    assert run("delete-user", "zed") == "zed not found! Unable to delete user.\n"
+
+
+def test_delete_user(run):
+    assert run("delete-user", "bob") == "bob deleted\n"
+    assert run("get-user", "bob") == "bob not found!\n"
+
+
+def test_create_user_rejects_duplicates(run):
+    assert run("create-user", "bob", "other@mail.com", "pass") == "Username or email already taken!\n"
+    assert run("create-user", "other", "bob@mail.com", "pass") == "Username or email already taken!\n"
+    assert run("get-all-users") == "(User id=1, username=bob ,email=bob@mail.com)\n"